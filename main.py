@@ -1,11 +1,31 @@
+import os
+
+# Pin the OMP pools before ctranslate2 is imported: give OpenMP every core
+# and keep MKL from spinning a second, competing pool
+os.environ.setdefault("OMP_NUM_THREADS", str(os.cpu_count()))
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+
 from gtts import gTTS
+import gtts.tts
+import requests
+from requests.adapters import HTTPAdapter, Retry
 import random
-import os
+import re
+import av
 import ffmpeg
-from faster_whisper import WhisperModel
-import moviepy.editor as mpe
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+import ctranslate2
+from faster_whisper import WhisperModel, BatchedInferencePipeline
 import argparse
+import asyncio
+import functools
 import json
+import hashlib
+import pathlib
+import subprocess
+import threading
 
 # Thing to do
 PROMPT_STEP = {
@@ -31,17 +51,7 @@ STEPS = [
 
     {
         "name": "Génération du clip vidéo",
-        "description": "Génère un clip vidéo à partir d'une vidéo de base dont la durée correspond à celle de l'audio.",
-    },
-
-    {
-        "name": "Ajout de l'audio au clip",
-        "description": "Ajoute la piste audio au clip vidéo.",
-    },
-
-    {
-        "name": "Nettoyage des fichiers temporaires",
-        "description": "Supprime les fichiers temporaires générés lors de la génération de la vidéo.",
+        "description": "Génère le clip final (vidéo, audio et sous-titres) à partir d'une vidéo de base en une seule passe ffmpeg.",
     },
 
     {
@@ -53,107 +63,455 @@ STEPS = [
 
 # Constants in camelCase
 CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
-TEMP_AUDIO_FILE = os.path.join(CURRENT_DIR, "audio.mp3")
+TTS_ENGINE = os.getenv('TTS_ENGINE', 'gtts')
+PIPER_VOICE = os.getenv('PIPER_VOICE', 'fr_FR-siwis-medium.onnx')
+# Vitesse de lecture Piper : < 1.0 = plus rapide, > 1.0 = plus lent
+PIPER_LENGTH_SCALE = float(os.getenv('PIPER_LENGTH_SCALE', '1.0'))
+# Piper produit du WAV (que ffmpeg et Whisper lisent directement), gTTS du MP3
+AUDIO_EXTENSION = ".wav" if TTS_ENGINE == "piper" else ".mp3"
 VIDEO_DATABASE =  os.path.join(CURRENT_DIR, "bases")
-TEMP_SRT_FILE = os.path.join(CURRENT_DIR, "sub.srt")
-TEMP_VIDEO_FILE = os.path.join(CURRENT_DIR, "temp.mp4")
+CACHE_DIR = os.path.join(CURRENT_DIR, "cache")
+# Fichiers de travail dans le dossier cache : os.replace vers l'entrée finale
+# reste alors atomique (même système de fichiers)
+TEMP_AUDIO_FILE = os.path.join(CACHE_DIR, "_staging" + AUDIO_EXTENSION)
+TEMP_SUB_FILE = os.path.join(CACHE_DIR, "_staging.ass")
 FFMPEG_BITRATE = os.getenv('FFMPEG_BITRATE', '4000k')
 FFMPEG_PRESET = os.getenv('FFMPEG_PRESET', 'ultrafast')
+# Forcer un encodeur vidéo précis ; vide = détection automatique
+FFMPEG_VCODEC = os.getenv('FFMPEG_VCODEC', '')
+
+CUDA_AVAILABLE = ctranslate2.get_cuda_device_count() > 0
+# Laisser vide pour la sélection automatique (int8 sur CPU, int8_float16 sur CUDA)
+WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', '')
+# 0 = choix automatique (8 sur CPU, 16 sur CUDA)
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '0'))
+# Forcer un checkpoint Whisper précis ; vide = choix automatique par langue
+WHISPER_MODEL = os.getenv('WHISPER_MODEL', '')
+
+# Serveur Whisper optionnel (voir serve.py) qui garde le modèle chargé
+USE_WHISPER_SERVER = os.getenv('USE_WHISPER_SERVER') == '1'
+WHISPER_SERVER_ADDRESS = ("127.0.0.1", int(os.getenv('WHISPER_SERVER_PORT', '7861')))
+WHISPER_SERVER_AUTHKEY = b"brainrotter"
 
 FINAL_VIDEO_FILE = "final.mp4"
-SUBTITLES_STYLE = "FontName=Montserrat,FontSize=18,PrimaryColour=&H00FFFFFF,OutlineColour=&H00000000,BorderStyle=0,Outline=0,Shadow=1,Bold=1,Alignment=10"
+HARD_SUBS = True
+SUBTITLES_RENDERER = os.getenv('SUBTITLES_RENDERER', 'libass')
+# Style incrusté une fois dans l'en-tête ASS (Montserrat gras, blanc, ombré,
+# centré) : libass n'a plus ni conversion SRT->ASS ni force_style à refaire
+SUBTITLES_ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 384
+PlayResY: 288
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Montserrat,18,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,-1,0,0,0,100,100,0,0,1,0,1,5,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+# Équivalent du style libass pour le filtre drawtext (texte centré, ombré, gras)
+DRAWTEXT_STYLE = {
+    "font": "Montserrat:style=Bold",
+    "fontsize": 48,
+    "fontcolor": "white",
+    "shadowcolor": "black",
+    "shadowx": 2,
+    "shadowy": 2,
+    "x": "(w-text_w)/2",
+    "y": "(h-text_h)/2"
+}
+
+# Whisper models, loaded lazily and kept in memory between calls.
+# The lock keeps concurrent first calls (asyncio worker threads, serve.py)
+# from loading the same checkpoint twice.
+_whisperModels = {}
+_whisperPipelines = {}
+_whisperLock = threading.RLock()
+
+def _whisperModelName(language):
+    """
+    Pick the Whisper checkpoint for the given language.
+    For English the distilled checkpoint is used: it keeps the same
+    accuracy with 2 decoder layers instead of 12, so decoding is
+    nearly twice as fast. WHISPER_MODEL overrides the choice.
+    """
+    if WHISPER_MODEL:
+        return WHISPER_MODEL
+    if language == "en":
+        return "Systran/faster-distil-whisper-small.en"
+    return "small"
+
+def _getWhisperModel(language="fr"):
+    """
+    Return the shared WhisperModel for the language, loading it on first use.
+    Uses int8 quantization (int8_float16 on CUDA), which is faster and
+    lighter than float32 for the same transcription quality.
+    """
+    modelName = _whisperModelName(language)
+    with _whisperLock:
+        if modelName not in _whisperModels:
+            _whisperModels[modelName] = WhisperModel(
+                modelName,
+                device="cuda" if CUDA_AVAILABLE else "cpu",
+                compute_type=WHISPER_COMPUTE_TYPE or ("int8_float16" if CUDA_AVAILABLE else "int8"),
+                cpu_threads=os.cpu_count(),
+                num_workers=1
+            )
+        return _whisperModels[modelName]
+
+def _getWhisperPipeline(language="fr"):
+    """
+    Return the shared BatchedInferencePipeline wrapping the Whisper model.
+    Batched decoding transcribes several audio windows at once, which is
+    much faster than the sequential 30s-window loop.
+    """
+    modelName = _whisperModelName(language)
+    with _whisperLock:
+        if modelName not in _whisperPipelines:
+            _whisperPipelines[modelName] = BatchedInferencePipeline(model=_getWhisperModel(language))
+        return _whisperPipelines[modelName]
+
+# Encodeurs H.264 matériels, du plus au moins prioritaire
+_HW_ENCODERS = ("h264_nvenc", "h264_qsv", "h264_videotoolbox")
+# Encodeur matériel détecté ("" si aucun, None tant que ffmpeg n'a pas été sondé)
+_hwEncoder = None
+
+def _detectHwEncoder():
+    """
+    Check once which hardware H.264 encoder the local ffmpeg build
+    exposes, if any.
+    """
+    global _hwEncoder
+    if _hwEncoder is None:
+        try:
+            result = subprocess.run(
+                ["ffmpeg", "-hide_banner", "-encoders"],
+                capture_output=True, text=True
+            )
+            _hwEncoder = next((encoder for encoder in _HW_ENCODERS if encoder in result.stdout), "")
+        except OSError:
+            _hwEncoder = ""
+    return _hwEncoder
+
+def _encoderArgs():
+    """
+    Encoding options for the final render. FFMPEG_VCODEC forces a codec;
+    otherwise a hardware encoder is used when available (NVENC, QSV or
+    VideoToolbox run several times faster than libx264), with the usual
+    libx264 settings as the CPU fallback.
+    """
+    vcodec = FFMPEG_VCODEC or _detectHwEncoder()
+    if vcodec == "h264_nvenc":
+        return dict(vcodec="h264_nvenc", preset="p5", rc="vbr", cq=19, threads=0)
+    if vcodec == "h264_qsv":
+        return dict(vcodec="h264_qsv", preset="fast", global_quality=19, threads=0)
+    if vcodec == "h264_videotoolbox":
+        return dict(vcodec="h264_videotoolbox", video_bitrate=FFMPEG_BITRATE, threads=0)
+    if vcodec and vcodec != "libx264":
+        return dict(vcodec=vcodec, video_bitrate=FFMPEG_BITRATE, threads=0)
+    # Pas de crf ici : avec un bitrate cible, libx264 passe en ABR et ignore le crf.
+    # Les x264-params privilégient le débit d'encodage sur la compression
+    # (threads en tranches, pas de lookahead ni de B-frames) pour des clips courts.
+    return dict(
+        vcodec="libx264",
+        video_bitrate=FFMPEG_BITRATE,
+        preset=FFMPEG_PRESET,
+        threads=0,
+        **{"x264-params": "sliced-threads=1:sync-lookahead=0:rc-lookahead=0:ref=1:bframes=0"}
+    )
+
+def _cacheKey(text, language, tld="com"):
+    """
+    Build the cache key for a script: hash of the text and TTS settings.
+    """
+    voice = f"{PIPER_VOICE}|{PIPER_LENGTH_SCALE}" if TTS_ENGINE == "piper" else tld
+    return hashlib.sha256(f"{text}|{language}|{TTS_ENGINE}|{voice}".encode()).hexdigest()[:16]
+
+class _KeepAliveSession(requests.Session):
+    """
+    Session whose close() is a no-op, so the connection pool survives the
+    'with requests.Session()' block gTTS opens for every ~100-char chunk.
+    """
+    def close(self):
+        pass
+
+_ttsSession = _KeepAliveSession()
+_ttsSession.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.3)
+))
+
+# gTTS creates a fresh session (and a fresh TLS handshake) per chunk; hand it
+# our pooled session instead so long scripts reuse one connection. Everything
+# besides Session (Request, exceptions, ...) is delegated to the real module.
+class _RequestsProxy:
+    @staticmethod
+    def Session():
+        return _ttsSession
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+gtts.tts.requests = _RequestsProxy()
+
+# Piper voice, loaded lazily (piper-tts is an optional dependency)
+_piperVoice = None
+
+def _getPiperVoice():
+    """
+    Return the shared Piper voice, loaded on first use from PIPER_VOICE.
+    """
+    global _piperVoice
+    if _piperVoice is None:
+        from piper import PiperVoice
+        _piperVoice = PiperVoice.load(PIPER_VOICE)
+    return _piperVoice
 
 def generateAudio(fileName, text, language="fr", tld="com"):
     """
-    Convert text to audio using gTTS and save it to fileName.
+    Convert text to audio and save it to fileName.
+    With TTS_ENGINE=piper the audio is synthesized locally (WAV, no
+    network); otherwise gTTS is used.
     """
+    if TTS_ENGINE == "piper":
+        voice = _getPiperVoice()
+        with wave.open(fileName, "wb") as wav:
+            if hasattr(voice, "synthesize_wav"):
+                # piper-tts >= 1.3 : la vitesse passe par SynthesisConfig
+                from piper import SynthesisConfig
+                voice.synthesize_wav(text, wav, syn_config=SynthesisConfig(length_scale=PIPER_LENGTH_SCALE))
+            else:
+                voice.synthesize(text, wav, length_scale=PIPER_LENGTH_SCALE)
+        return
     tts = gTTS(text=text, lang=language, tld=tld)
     tts.save(fileName)
 
-def getRandomVideo(folder):
+# Extensions vidéo acceptées, compilées une fois (matching insensible à la casse)
+_VIDEO_RE = re.compile(r"\.(?:mp4|avi|mov)$", re.IGNORECASE)
+
+@functools.lru_cache(maxsize=8)
+def _listVideos(folder, mtime):
+    """
+    List the video files of a folder. Cached on (folder, mtime) so
+    repeated generations only rescan the folder after it changed.
+    """
+    with os.scandir(folder) as entries:
+        return [entry.path for entry in entries if _VIDEO_RE.search(entry.name)]
+
+@functools.lru_cache(maxsize=8)
+def _videoIndex(folder, mtime):
     """
-    Select a random video file from the given folder.
+    Build the (path, duration) index of a folder's videos, cached on
+    (folder, mtime). Unreadable files are skipped.
     """
-    videoFiles = [f for f in os.listdir(folder) if f.endswith(('.mp4', '.avi', '.mov'))]
-    if not videoFiles:
+    videos = []
+    for path in _listVideos(folder, mtime):
+        try:
+            videos.append((path, _probeVideoStream(path, os.stat(path).st_mtime_ns)["duration"]))
+        except (av.AVError, OSError, ValueError):
+            continue
+    return videos
+
+def getRandomVideo(folder, minDuration=0):
+    """
+    Select a random video file from the given folder, among the ones at
+    least minDuration seconds long.
+    """
+    videos = _videoIndex(folder, os.stat(folder).st_mtime_ns)
+    if not videos:
         raise FileNotFoundError("No video files found in the videoDatabase folder.")
-    selectedVideo = os.path.join(folder, random.choice(videoFiles))
-    return selectedVideo
+    candidates = [path for path, duration in videos if duration >= minDuration]
+    if not candidates:
+        raise ValueError("Aucune vidéo de base n'est au moins aussi longue que l'audio.")
+    return random.choice(candidates)
+
+def transcribeAudio(audioPath, language="fr"):
+    """
+    Transcribe the audio with the local model and return the detected
+    language, the audio duration and, per segment, the timestamped words
+    as (start, end, word) tuples. Plain tuples only, so the result can
+    travel through serve.py.
+    """
+    pipeline = _getWhisperPipeline(language)
+    segments, info = pipeline.transcribe(
+        audioPath,
+        language=language,
+        batch_size=WHISPER_BATCH_SIZE or (16 if CUDA_AVAILABLE else 8),
+        beam_size=1,
+        condition_on_previous_text=False,
+        vad_filter=True,
+        vad_parameters=dict(min_silence_duration_ms=300),
+        word_timestamps=True
+    )
+    return info.language, info.duration, [
+        [(word.start, word.end, word.word) for word in segment.words]
+        for segment in segments
+    ]
+
+class _WhisperServerManager(BaseManager):
+    pass
+
+_WhisperServerManager.register("getService")
+
+def _transcribeRemote(audioPath, language="fr"):
+    """
+    Transcribe through the warm serve.py daemon instead of loading the
+    model in this process.
+    """
+    manager = _WhisperServerManager(address=WHISPER_SERVER_ADDRESS, authkey=WHISPER_SERVER_AUTHKEY)
+    manager.connect()
+    return manager.getService().transcribe(audioPath, language)
+
+# Modèles d'alignement whisperx, chargés paresseusement par langue
+_alignModels = {}
+
+def generateSubtitlesFromKnownText(audioPath, text, maxWordsPerSegment=5, language="fr"):
+    """
+    Align the already-known script text on the audio instead of
+    re-transcribing it: the aligner only maps text to timestamps, which
+    is far cheaper than a full Whisper decode. Needs whisperx (optional);
+    falls back to generateSubtitles when it is not installed.
+    """
+    try:
+        import whisperx
+    except ImportError:
+        return generateSubtitles(audioPath, maxWordsPerSegment, language)
+
+    duration = getAudioDuration(audioPath)
+    device = "cuda" if CUDA_AVAILABLE else "cpu"
+    with _whisperLock:
+        if language not in _alignModels:
+            _alignModels[language] = whisperx.load_align_model(language_code=language, device=device)
+    alignModel, metadata = _alignModels[language]
+
+    aligned = whisperx.align(
+        [{"text": text, "start": 0.0, "end": duration}],
+        alignModel, metadata, audioPath, device
+    )
+    words = [
+        (word["start"], word["end"], word["word"])
+        for word in aligned["word_segments"]
+        if "start" in word
+    ]
+    return language, duration, _groupWordsIntoSegments([words], maxWordsPerSegment)
+
+def _groupWordsIntoSegments(rawSegments, maxWordsPerSegment):
+    """
+    Group timestamped (start, end, word) tuples into subtitle chunks;
+    each chunk spans exactly the interval of its words.
+    """
+    newSegments = []
+    for words in rawSegments:
+        for i in range(0, len(words), maxWordsPerSegment):
+            chunk = words[i:i + maxWordsPerSegment]
+            newSegments.append((chunk[0][0], chunk[-1][1], " ".join(word.strip() for _, _, word in chunk)))
+    return newSegments
 
 def generateSubtitles(audioPath, maxWordsPerSegment=5, language="fr"):
     """
     Transcribe the audio and split the text into subtitle segments.
+    Returns the detected language, the audio duration and the segments.
     """
-    model = WhisperModel("small", compute_type="float32")
-    segments, info = model.transcribe(audioPath, language=language)
-    language = info.language
-    
-    newSegments = []
-    for segment in segments:
-        words = segment.text.split()
-        startTime = segment.start
-        endTime = segment.end
-        durationPerWord = (endTime - startTime) / len(words) if words else 0
+    if USE_WHISPER_SERVER:
+        language, duration, rawSegments = _transcribeRemote(audioPath, language)
+    else:
+        language, duration, rawSegments = transcribeAudio(audioPath, language)
 
-        for i in range(0, len(words), maxWordsPerSegment):
-            subText = " ".join(words[i:i + maxWordsPerSegment])
-            subStart = startTime + i * durationPerWord
-            subEnd = min(startTime + (i + maxWordsPerSegment) * durationPerWord, endTime)
-            newSegments.append((subStart, subEnd, subText))
+    newSegments = _groupWordsIntoSegments(rawSegments, maxWordsPerSegment)
     
     #print("[LOG] Generated subtitle segments:")
     #for subStart, subEnd, subText in newSegments:
     #    print(f"\t[{subStart:.2f}s -> {subEnd:.2f}s] {subText}")
-        
-    return language, newSegments
+
+    return language, duration, newSegments
 
 def formatTime(seconds):
     """
-    Convert seconds into SRT format (HH:MM:SS,mmm).
+    Convert seconds into ASS format (H:MM:SS.cc).
     """
-    millisec = int((seconds % 1) * 1000)
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    sec = int(seconds % 60)
-    return f"{hours:02}:{minutes:02}:{sec:02},{millisec:03}"
+    sec, centisec = divmod(int(seconds * 100), 100)
+    minutes, sec = divmod(sec, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{sec:02}.{centisec:02}"
 
 def generateSubtitleFile(fileName, segments):
     """
-    Generate an SRT file from subtitle segments.
+    Generate an ASS subtitle file from subtitle segments, with the style
+    embedded once in the header.
     """
-    text = ""
-    for index, segment in enumerate(segments):
-        segmentStart = formatTime(segment[0])
-        segmentEnd = formatTime(segment[1])
-        text += f"{index + 1}\n{segmentStart} --> {segmentEnd}\n{segment[2]}\n\n"
-
+    _ft = formatTime
+    cues = [
+        f"Dialogue: 0,{_ft(segmentStart)},{_ft(segmentEnd)},Default,,0,0,0,,{segmentText}\n"
+        for segmentStart, segmentEnd, segmentText in segments
+    ]
     with open(fileName, "w", encoding="utf-8") as f:
-        f.write(text)
+        f.write(SUBTITLES_ASS_HEADER)
+        f.writelines(cues)
 
 def getAudioDuration(audioFile):
     """
-    Get the duration of the audio file.
+    Get the duration of the audio file, read in-process with PyAV
+    instead of spawning an ffprobe subprocess.
     """
-    probeAudio = ffmpeg.probe(audioFile)
-    audioStream = next((stream for stream in probeAudio["streams"] if stream["codec_type"] == "audio"), None)
-    if not audioStream:
-        raise ValueError("Aucun flux audio trouvé dans le fichier audio.")
-    return float(audioStream["duration"])
-
-def generateClip(baseVideo, audioFile, subtitleFile, outputFile):
+    with av.open(audioFile) as container:
+        audioStream = next((stream for stream in container.streams if stream.type == "audio"), None)
+        if audioStream is None:
+            raise ValueError("Aucun flux audio trouvé dans le fichier audio.")
+        if audioStream.duration is not None:
+            return float(audioStream.duration * audioStream.time_base)
+        return container.duration / 1000000
+
+@functools.lru_cache(maxsize=32)
+def _probeVideoStream(path, mtime):
+    """
+    Retourne les infos du flux vidéo d'un fichier, lues en place avec
+    PyAV (pas de sous-processus ffprobe) et mises en cache par
+    (chemin, mtime) pour éviter de relire une même vidéo de base.
+    """
+    with av.open(path) as container:
+        videoStream = next((stream for stream in container.streams if stream.type == "video"), None)
+        if videoStream is None:
+            raise ValueError("Aucun flux vidéo trouvé dans la vidéo de base.")
+        if videoStream.duration is not None:
+            duration = float(videoStream.duration * videoStream.time_base)
+        else:
+            duration = container.duration / 1000000
+        return {
+            "codec_name": videoStream.codec_context.name,
+            "width": videoStream.codec_context.width,
+            "height": videoStream.codec_context.height,
+            "duration": duration,
+        }
+
+def _canStreamCopy(videoStream):
+    """
+    Vérifie si la vidéo de base est déjà en H.264 au format portrait (9:16),
+    auquel cas le flux vidéo peut être copié tel quel sans réencodage.
+    """
+    width = videoStream.get("width", 0)
+    height = videoStream.get("height", 0)
+    if videoStream.get("codec_name") != "h264" or not width or not height:
+        return False
+    # Tolérance de 2% sur le ratio : les sources "9:16" réelles ne tombent
+    # pas toujours sur un ratio exact
+    return abs(width / height - 9 / 16) < 0.02 * (9 / 16)
+
+def generateClip(baseVideo, audioFile, subtitleFile, outputFile, hardSubs=True, audioDuration=None, segments=None):
     """
     Génère un clip vidéo à partir de baseVideo dont la durée correspond à celle de audioFile.
-    Le clip est rogné en format portrait (9:16) et les sous-titres sont ajoutés.
-    Le fichier de sortie ne contient pas d'audio et ne comporte aucune métadonnée.
+    Le clip est rogné en format portrait (9:16), les sous-titres sont ajoutés et la piste
+    audio est muxée dans la même passe ffmpeg. Le fichier de sortie ne comporte aucune métadonnée.
+    Avec hardSubs=False et une vidéo de base déjà en H.264 9:16, le flux vidéo est copié
+    sans réencodage et les sous-titres sont muxés en piste logicielle (mov_text).
     """
-    # Obtenir la durée du fichier audio
-    audioDuration = getAudioDuration(audioFile)
-    
-    # Obtenir la durée de la vidéo de base
-    probeVideo = ffmpeg.probe(baseVideo)
-    videoStream = next((stream for stream in probeVideo["streams"] if stream["codec_type"] == "video"), None)
-    if not videoStream:
-        raise ValueError("Aucun flux vidéo trouvé dans la vidéo de base.")
+    # Obtenir la durée du fichier audio (réutilisée depuis Whisper si déjà connue)
+    if audioDuration is None:
+        audioDuration = getAudioDuration(audioFile)
+
+    # Obtenir la durée de la vidéo de base (probe mis en cache par fichier)
+    videoStream = _probeVideoStream(baseVideo, os.stat(baseVideo).st_mtime_ns)
     videoDuration = float(videoStream["duration"])
     
     if videoDuration < audioDuration:
@@ -161,74 +519,137 @@ def generateClip(baseVideo, audioFile, subtitleFile, outputFile):
     
     # Déterminer un point de départ aléatoire pour le clip
     startTime = random.uniform(0, videoDuration - audioDuration)
-    
-    # Extraire le clip de la vidéo de base avec la durée de l'audio
-    video_clip = ffmpeg.input(baseVideo, ss=startTime, t=audioDuration)
+
+    # Chemin rapide : copie du flux vidéo + sous-titres en piste logicielle,
+    # aucun décodage/réencodage n'est nécessaire
+    if not hardSubs and _canStreamCopy(videoStream):
+        # Ne mapper que le flux vidéo : l'audio de la vidéo de base ne doit
+        # pas se retrouver dans le fichier final
+        ffmpeg.output(
+            ffmpeg.input(baseVideo, ss=startTime, t=audioDuration, **{"noaccurate_seek": None}).video,
+            ffmpeg.input(audioFile),
+            ffmpeg.input(subtitleFile),
+            outputFile,
+            vcodec="copy",
+            acodec="aac",
+            audio_bitrate="192k",
+            scodec="mov_text",
+            shortest=None,
+            map_metadata="-1"
+        ).run(overwrite_output=True, quiet=True, capture_stderr=True, capture_stdout=True)
+        return
+
+    # Extraire le clip de la vidéo de base avec la durée de l'audio.
+    # Le point de départ étant aléatoire, un seek au keyframe le plus proche
+    # suffit (noaccurate_seek), ce qui évite de décoder jusqu'à la frame exacte.
+    video_clip = ffmpeg.input(baseVideo, ss=startTime, t=audioDuration, **{"noaccurate_seek": None})
     
     # Appliquer le rognage pour obtenir le format portrait (9:16)
     video_clip = video_clip.filter("crop", "in_h*9/16", "in_h", "(in_w-out_w)/2", 0)
     
-    # Les sous titre doivent être dans un chemin relatif parce que ffmpeg n'aime pas les chemins absolus sous windows je suppose
-    subtitleFile = os.path.relpath(subtitleFile, ".")
-
-    # Ajouter les sous-titres à partir du fichier de sous-titres
-    video_clip = video_clip.filter("subtitles", subtitleFile, force_style=SUBTITLES_STYLE)
-    
-    # Exporter la vidéo (sans audio) et supprimer toutes les métadonnées avec -map_metadata -1
+    if SUBTITLES_RENDERER == "drawtext" and segments is not None:
+        # Incruster chaque segment avec drawtext (un filtre par segment,
+        # activé sur sa fenêtre temporelle), sans passer par libass
+        for subStart, subEnd, subText in segments:
+            video_clip = video_clip.filter(
+                "drawtext",
+                text=subText,
+                enable=f"between(t,{subStart},{subEnd})",
+                expansion="none",
+                **DRAWTEXT_STYLE
+            )
+    else:
+        # Les sous titre doivent être dans un chemin relatif parce que ffmpeg n'aime pas les chemins absolus sous windows je suppose
+        subtitleFile = os.path.relpath(subtitleFile, ".")
+
+        # Ajouter les sous-titres : le fichier ASS embarque déjà son style
+        video_clip = video_clip.filter("ass", subtitleFile)
+
+    # La piste audio est muxée directement dans la même passe
+    audio_clip = ffmpeg.input(audioFile)
+
+    # Exporter la vidéo et supprimer toutes les métadonnées avec -map_metadata -1
     ffmpeg.output(
-        video_clip, 
-        outputFile, 
-        vcodec="libx264", 
-        video_bitrate=FFMPEG_BITRATE, 
-        preset=FFMPEG_PRESET, 
-        crf=18, 
-        an=None,  # Indique de ne pas inclure d'audio
-        map_metadata="-1"
+        video_clip,
+        audio_clip,
+        outputFile,
+        acodec="aac",
+        audio_bitrate="192k",
+        shortest=None,
+        map_metadata="-1",
+        **_encoderArgs()
     ).run(overwrite_output=True, quiet=True, capture_stderr=True, capture_stdout=True)
 
-def addAudio(baseVideo, audioFile, outputFile):
-    """
-    Ajoute la piste audio du fichier audioFile à la vidéo baseVideo.
-    Le résultat final est enregistré dans outputFile.
-    """
-    my_clip = mpe.VideoFileClip(baseVideo, audio=False)
-    audio_background = mpe.AudioFileClip(audioFile)
-    final_clip = my_clip.set_audio(audio_background)
-    final_clip.write_videofile(outputFile, verbose=False, logger=None)
-    
-def generateVideo(text, language):
+def generateVideo(text, language, encodeExecutor=None, alignKnownText=False):
     """
     Complete pipeline:
       1. Generate audio.
       2. Transcribe and generate subtitles.
       3. Create the final video (random clip, audio, subtitles) in a single ffmpeg pass.
-      4. Clean up temporary files.
+    With encodeExecutor, the final encode is submitted to the executor and
+    its Future is returned instead of waiting for it (used by batch mode).
+    With alignKnownText, the subtitles come from aligning text on the audio
+    instead of a full transcription (the script paths, where the spoken
+    text is known in advance).
     """
-    # 1. Generate audio
-    generateAudio(TEMP_AUDIO_FILE, text, language=language)
-    printNextStep()
-    
-    # 2. Transcribe audio and generate SRT file
-    language, segments = generateSubtitles(TEMP_AUDIO_FILE, language=language)
-    generateSubtitleFile(TEMP_SRT_FILE, segments)
-    printNextStep()
-    
-    # 3. Select a random video and create the final video
-    videoFile = getRandomVideo(VIDEO_DATABASE)
+    return asyncio.run(_generateVideoAsync(text, language, encodeExecutor, alignKnownText))
 
-    # 4. Generate the clip with subtitles
-    generateClip(videoFile, TEMP_AUDIO_FILE, TEMP_SRT_FILE, TEMP_VIDEO_FILE)
-    printNextStep()
-    
-    # 5. Add audio to the clip
-    addAudio(TEMP_VIDEO_FILE, TEMP_AUDIO_FILE, FINAL_VIDEO_FILE)
-    printNextStep()
+async def _generateVideoAsync(text, language, encodeExecutor=None, alignKnownText=False):
+    """
+    Async body of generateVideo. The TTS call is network-bound and the
+    base-video selection is disk-bound, so the two run concurrently;
+    transcription starts as soon as the audio file exists.
+    """
+    # Cached audio and subtitles, keyed by the script text and TTS settings
+    key = _cacheKey(text, language)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    audioFile = os.path.join(CACHE_DIR, key + AUDIO_EXTENSION)
+    subFile = os.path.join(CACHE_DIR, f"{key}.ass")
 
-    # 6. Delete temporary files
-    os.remove(TEMP_AUDIO_FILE)
-    os.remove(TEMP_SRT_FILE)
-    os.remove(TEMP_VIDEO_FILE)
-    printNextStep()
+    try:
+        # The video index does not depend on the audio, start building it right away
+        indexTask = asyncio.create_task(
+            asyncio.to_thread(_videoIndex, VIDEO_DATABASE, os.stat(VIDEO_DATABASE).st_mtime_ns)
+        )
+
+        # 1. Generate audio (skipped on cache hit)
+        if not os.path.exists(audioFile):
+            await asyncio.to_thread(generateAudio, TEMP_AUDIO_FILE, text, language=language)
+            os.replace(TEMP_AUDIO_FILE, audioFile)
+        printNextStep()
+
+        # 2. Transcribe audio and generate ASS file (skipped on cache hit)
+        audioDuration = None
+        segments = None
+        if not os.path.exists(subFile):
+            if alignKnownText:
+                language, audioDuration, segments = await asyncio.to_thread(generateSubtitlesFromKnownText, audioFile, text, language=language)
+            else:
+                language, audioDuration, segments = await asyncio.to_thread(generateSubtitles, audioFile, language=language)
+            generateSubtitleFile(TEMP_SUB_FILE, segments)
+            os.replace(TEMP_SUB_FILE, subFile)
+        printNextStep()
+
+        # 3. Pick a base video long enough for the narration (warm index)
+        await indexTask
+        if audioDuration is None:
+            audioDuration = getAudioDuration(audioFile)
+        videoFile = getRandomVideo(VIDEO_DATABASE, audioDuration)
+
+        # 4. Generate the final clip with audio and subtitles in one ffmpeg pass.
+        # En mode batch, l'encode part dans l'executor pour tourner pendant la
+        # préparation (TTS/Whisper) de la vidéo suivante.
+        if encodeExecutor is not None:
+            return encodeExecutor.submit(
+                generateClip, videoFile, audioFile, subFile, FINAL_VIDEO_FILE,
+                hardSubs=HARD_SUBS, audioDuration=audioDuration, segments=segments
+            )
+        generateClip(videoFile, audioFile, subFile, FINAL_VIDEO_FILE, hardSubs=HARD_SUBS, audioDuration=audioDuration, segments=segments)
+        printNextStep()
+    finally:
+        # Ne jamais laisser traîner un fichier de travail après un échec
+        for path in (TEMP_AUDIO_FILE, TEMP_SUB_FILE):
+            pathlib.Path(path).unlink(missing_ok=True)
 
 def generateVideoFromScriptFile(scriptFile, language):
     """
@@ -238,8 +659,36 @@ def generateVideoFromScriptFile(scriptFile, language):
     with open(scriptFile, "r", encoding="utf-8") as f:
         scriptText = f.read()
 
-    # Generate the video
-    generateVideo(scriptText, language)
+    # Generate the video (the spoken text is known, so subtitles can be
+    # aligned instead of transcribed)
+    generateVideo(scriptText, language, alignKnownText=True)
+
+def generateVideoBatch(batchFile, defaultLanguage):
+    """
+    Generate one video per JSONL record of batchFile
+    ({"script": ..., "output": ..., "language": ...}).
+    Running the whole batch in a single process pays the imports and the
+    Whisper model load once instead of once per video.
+    """
+    global FINAL_VIDEO_FILE
+
+    with open(batchFile, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    # Charger le modèle une fois avant la boucle
+    if not USE_WHISPER_SERVER:
+        _getWhisperPipeline(defaultLanguage)
+
+    # Les fichiers audio/srt vivent dans le cache (chemins propres à chaque
+    # script), donc l'encode d'une vidéo peut tourner pendant que la suivante
+    # est préparée sans partage de fichiers temporaires
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        encodes = []
+        for index, record in enumerate(records):
+            FINAL_VIDEO_FILE = record.get("output", f"final_{index}.mp4")
+            encodes.append(generateVideo(record["script"], record.get("language", defaultLanguage), encodeExecutor=executor, alignKnownText=True))
+        for encode in encodes:
+            encode.result()
 
 def generateVideoFromPrompt(prompt, language):
     """
@@ -269,6 +718,8 @@ if __name__ == "__main__":
     parser.add_argument("-p", "--prompt", type=str, help="Prompt that generate the script file", default=None)
     parser.add_argument("-v", "--videos", type=str, help="Path to the folder containing video files", default=VIDEO_DATABASE)
     parser.add_argument("-l", "--language", type=str, help="Language used by the script (fr, en)", default="fr")
+    parser.add_argument("--soft-subs", action="store_true", help="Mux subtitles as a soft track instead of burning them (enables stream copy on 9:16 H.264 sources)")
+    parser.add_argument("--batch", type=str, help="Path to a JSONL file of {\"script\", \"output\", \"language\"} records to generate in one process", default=None)
     
     try:
         args = parser.parse_args()
@@ -276,6 +727,14 @@ if __name__ == "__main__":
         # Override the default values if provided via command-line.
         FINAL_VIDEO_FILE = args.output
         VIDEO_DATABASE = args.videos
+        HARD_SUBS = not args.soft_subs
+
+        # Batch mode generates every record of the JSONL file and ignores script/prompt
+        if args.batch is not None:
+            if args.script is not None or args.prompt is not None:
+                raise Exception("Please provide either a batch file or a script/prompt, not both.")
+            generateVideoBatch(args.batch, args.language)
+            exit()
 
         # Check if there is a prompt or a text, but not both
         if args.script is None and args.prompt is None:
@@ -20,8 +20,15 @@ with open(PROMPT_FILE, 'r', encoding='utf-8') as file:
 # Configure API
 genai.configure(api_key=GOOGLE_API_KEY)
 
-# Get model
-model = genai.GenerativeModel(MODEL)
+# Model handle, created on first use then reused so every call shares the
+# same grpc channel (no new TLS handshake per script)
+_model = None
+
+def _getModel():
+    global _model
+    if _model is None:
+        _model = genai.GenerativeModel(MODEL)
+    return _model
 
 # Create the prompt for gemini
 def generateGeminiPrompt(userPrompt):
@@ -31,11 +38,13 @@ def generateGeminiPrompt(userPrompt):
 def generateScriptFromPrompt(userPrompt):
     """
     Generate a script from the given prompt.
+    The response is streamed, so chunks are received while Gemini is
+    still generating instead of waiting for the full completion.
     """
     # Generate script
     prompt = generateGeminiPrompt(userPrompt)
-    response = model.generate_content(prompt)
-    script = response.text
+    response = _getModel().generate_content(prompt, stream=True)
+    script = "".join(chunk.text for chunk in response)
 
     # Return script
     return script
\ No newline at end of file
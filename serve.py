@@ -0,0 +1,34 @@
+# Petit serveur qui garde le modèle Whisper chargé en mémoire.
+# Lancer `python serve.py` une fois, puis exécuter main.py avec
+# USE_WHISPER_SERVER=1 : la transcription réutilise le modèle déjà chaud
+# au lieu de recharger les poids à chaque invocation.
+from multiprocessing.managers import BaseManager
+
+from main import (
+    transcribeAudio,
+    _getWhisperPipeline,
+    WHISPER_SERVER_ADDRESS,
+    WHISPER_SERVER_AUTHKEY,
+)
+
+class WhisperService:
+    """
+    Service exposé aux clients : transcrit un fichier audio avec le
+    modèle partagé du processus serveur.
+    """
+    def transcribe(self, audioPath, language="fr"):
+        return transcribeAudio(audioPath, language)
+
+class WhisperServerManager(BaseManager):
+    pass
+
+if __name__ == "__main__":
+    service = WhisperService()
+    WhisperServerManager.register("getService", callable=lambda: service)
+
+    # Charger le modèle tout de suite pour que la première requête soit déjà chaude
+    _getWhisperPipeline()
+
+    server = WhisperServerManager(address=WHISPER_SERVER_ADDRESS, authkey=WHISPER_SERVER_AUTHKEY).get_server()
+    print(f"[SERVE] Modèle Whisper chargé, en écoute sur {WHISPER_SERVER_ADDRESS[0]}:{WHISPER_SERVER_ADDRESS[1]}")
+    server.serve_forever()